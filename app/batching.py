@@ -0,0 +1,172 @@
+"""Dynamic batching of concurrent embedding requests."""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.embedding_service import EmbeddingService, embedding_service
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PendingRequest:
+    """A queued embedding request waiting for its share of a batch."""
+
+    texts: List[str]
+    model_name: Optional[str]
+    normalize: bool
+    batch_size: Optional[int]
+    future: asyncio.Future
+
+    @property
+    def key(self) -> tuple:
+        """Requests with equal keys can share a single encode call."""
+        return (self.model_name, self.normalize, self.batch_size)
+
+
+class BatchingEngine:
+    """Coalesces concurrent embedding requests into shared encode calls."""
+
+    def __init__(
+        self,
+        service: EmbeddingService,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """Initialize the batching engine."""
+        settings = get_settings()
+        self.service = service
+        self.max_batch_size = max_batch_size or settings.max_batch_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.batch_max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def is_running(self) -> bool:
+        """Check if the worker is running on the current event loop."""
+        return (
+            self._worker is not None
+            and not self._worker.done()
+            and self._loop is asyncio.get_running_loop()
+        )
+
+    def start(self) -> None:
+        """Start the background worker on the running event loop."""
+        if self.is_running():
+            return
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # Keep the queue when restarting on the same loop so queued requests survive
+            self._queue = asyncio.Queue()
+        self._loop = loop
+        self._worker = asyncio.create_task(self._run())
+        logger.info("Batching engine started")
+
+    async def stop(self) -> None:
+        """Stop the background worker and fail any requests still queued."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while self._queue is not None and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Batching engine stopped"))
+        self._worker = None
+        logger.info("Batching engine stopped")
+
+    async def submit(
+        self,
+        texts: List[str],
+        model_name: Optional[str] = None,
+        normalize: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Tuple[np.ndarray, float]:
+        """Queue texts for embedding and wait for the batch that contains them."""
+        if not texts:
+            raise ValueError("Texts list cannot be empty")
+
+        self.start()
+        future = self._loop.create_future()
+        self._queue.put_nowait(PendingRequest(texts, model_name, normalize, batch_size, future))
+        return await future
+
+    async def _run(self) -> None:
+        """Worker loop: collect queued requests and encode them together."""
+        while True:
+            pending = await self._collect()
+
+            # Only requests with the same encode parameters can share a call
+            groups: Dict[tuple, List[PendingRequest]] = {}
+            for request in pending:
+                groups.setdefault(request.key, []).append(request)
+
+            for requests in groups.values():
+                try:
+                    await self._process(requests)
+                except Exception as e:
+                    # Never let one bad group kill the worker and strand every later request
+                    logger.error(f"Batch processing failed: {str(e)}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+
+    async def _collect(self) -> List[PendingRequest]:
+        """Wait for one request, then gather more until the batch is full or the wait expires."""
+        pending = [await self._queue.get()]
+        total_texts = len(pending[0].texts)
+        deadline = self._loop.time() + self.max_wait
+
+        while total_texts < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(request)
+            total_texts += len(request.texts)
+
+        return pending
+
+    async def _process(self, requests: List[PendingRequest]) -> None:
+        """Encode the texts of all requests at once and hand each its slice."""
+        first = requests[0]
+        all_texts = [text for request in requests for text in request.texts]
+        logger.debug("Encoding %d texts from %d requests in one batch", len(all_texts), len(requests))
+
+        try:
+            embeddings, processing_time = await self._loop.run_in_executor(
+                None,
+                self.service.encode,
+                all_texts,
+                first.model_name,
+                first.normalize,
+                first.batch_size
+            )
+            if len(embeddings) != len(all_texts):
+                raise RuntimeError(f"Expected {len(all_texts)} embeddings, got {len(embeddings)}")
+
+            offset = 0
+            for request in requests:
+                end = offset + len(request.texts)
+                if not request.future.done():
+                    request.future.set_result((embeddings[offset:end], processing_time))
+                offset = end
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+
+# Global batching engine instance
+batching_engine = BatchingEngine(embedding_service)
@@ -1,7 +1,8 @@
 """Configuration management for the embeddings generator."""
 
 import os
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -28,6 +29,24 @@ class Settings(BaseSettings):
     model_cache_dir: str = Field(default="/app/models", env="MODEL_CACHE_DIR", alias="model_cache_dir")
     max_batch_size: int = Field(default=32, env="MAX_BATCH_SIZE")
     max_sequence_length: int = Field(default=512, env="MAX_SEQUENCE_LENGTH")
+    batch_max_wait_ms: float = Field(default=5.0, env="BATCH_MAX_WAIT_MS")
+    embedding_cache_size: int = Field(default=10000, env="EMBEDDING_CACHE_SIZE")
+    bucket_by_length: bool = Field(default=True, env="BUCKET_BY_LENGTH")
+
+    # Inference Backend ("torch" or "onnx")
+    backend: str = Field(default="torch", env="BACKEND")
+    onnx_file_name: str = Field(default="model_qint8_avx512_vnni.onnx", env="ONNX_FILE_NAME")
+    fast_encode: bool = Field(default=True, env="FAST_ENCODE")
+    # Defaults to half the logical CPUs (one per physical core with SMT)
+    torch_num_threads: Optional[int] = Field(default=None, env="TORCH_NUM_THREADS")
+    use_bettertransformer: bool = Field(default=False, env="USE_BETTERTRANSFORMER")
+    torch_compile: bool = Field(default=False, env="TORCH_COMPILE")
+
+    # Warmup Configuration
+    warmup_on_startup: bool = Field(default=True, env="WARMUP_ON_STARTUP")
+    warmup_texts: List[str] = Field(
+        default=["warmup sentence one", "warmup sentence two"], env="WARMUP_TEXTS"
+    )
 
     # Docker Configuration
     docker_image_name: str = Field(default="embeddings-generator", env="DOCKER_IMAGE_NAME")
@@ -50,10 +69,7 @@ class Settings(BaseSettings):
         protected_namespaces = ('settings_',)
 
 
-# Global settings instance
-settings = Settings()
-
-
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get application settings."""
-    return settings
+    """Get application settings, read from the environment once and cached."""
+    return Settings()
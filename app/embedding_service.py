@@ -1,77 +1,349 @@
 """Embedding generation service using Hugging Face models."""
 
+import glob
+import logging
+import os
+import threading
 import time
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
-import torch
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModel
 
 from app.config import get_settings
 from app.logger import get_logger
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 logger = get_logger(__name__)
 
+# Files worth pulling into the page cache before a model is loaded
+WEIGHT_FILE_SUFFIXES = (".safetensors", ".bin", ".onnx")
+
 
 class EmbeddingService:
     """Service for generating embeddings using Hugging Face models."""
 
     def __init__(self):
         """Initialize the embedding service."""
-        self.settings = get_settings()
-        self.model: Optional[SentenceTransformer] = None
+        settings = get_settings()
+        # Keep only the settings this service reads, as plain attributes
+        self._default_model_name = settings.default_model_name
+        self._cache_dir = settings.model_cache_dir
+        self._max_batch = settings.max_batch_size
+        self._max_seq = settings.max_sequence_length
+        self._requested_backend = settings.backend
+        self._onnx_file_name = settings.onnx_file_name
+        self._fast_encode = settings.fast_encode
+        self._use_bettertransformer = settings.use_bettertransformer
+        self._torch_compile = settings.torch_compile
+        self._bucket_by_length = settings.bucket_by_length
+        self.model: Optional["SentenceTransformer"] = None
         self.model_name: Optional[str] = None
+        self.backend: Optional[str] = None
+        # Metadata about the loaded model, computed once in load_model
+        self.model_info: Optional[dict] = None
         self.device = "cpu"  # Force CPU usage
+        # One inference thread per physical core by default; more only thrashes caches
+        self.num_threads = settings.torch_num_threads or max((os.cpu_count() or 1) // 2, 1)
+        # torch module, imported on first model load
+        self._torch = None
+        # Components for the direct tokenizer + forward path (see _tokenize, _forward)
+        self._tokenizer = None
+        self._transformer = None
+        self._lower_case = False
+        self._max_seq_length: Optional[int] = None
+        self._always_normalize = False
+        # Tokenizes the next batch while the current one runs through the model
+        self._tokenizer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tokenizer")
+        # LRU cache of embeddings keyed by (model_name, normalize, text)
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._cache_max = settings.embedding_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Serializes model loading and inference across threads
+        self._lock = threading.RLock()
         
         # Ensure model cache directory exists
-        import os
-        os.makedirs(self.settings.model_cache_dir, exist_ok=True)
+        os.makedirs(self._cache_dir, exist_ok=True)
 
     def load_model(self, model_name: Optional[str] = None) -> None:
         """Load a Hugging Face model for embedding generation."""
-        model_name = model_name or self.settings.default_model_name
+        model_name = model_name or self._default_model_name
         
-        if self.model_name == model_name and self.model is not None:
-            logger.info(f"Model {model_name} is already loaded")
-            return
+        with self._lock:
+            if self.model_name == model_name and self.model is not None:
+                logger.info(f"Model {model_name} is already loaded")
+                return
+            
+            try:
+                logger.info(f"Loading model: {model_name}")
+                start_time = time.time()
+                
+                # Heavy ML libraries are imported on first load rather than at
+                # startup, so health checks respond before torch is loaded
+                if self._torch is None:
+                    import torch
+                    self._configure_threads(torch)
+                    self._torch = torch
+                from sentence_transformers import SentenceTransformer
+                
+                model = None
+                backend = "torch"
+                if self._requested_backend == "onnx":
+                    try:
+                        model = self._load_onnx_model(model_name)
+                        backend = "onnx"
+                    except Exception as e:
+                        logger.warning(
+                            f"ONNX backend unavailable for {model_name}, falling back to PyTorch: {str(e)}"
+                        )
+                
+                if model is None:
+                    # Load model with CPU-only configuration
+                    model = SentenceTransformer(
+                        model_name,
+                        cache_folder=self._cache_dir,
+                        device=self.device
+                    )
+                    self._ensure_fast_tokenizer(model)
+                    self._optimize_transformer(model)
+                
+                # Ensure model is in evaluation mode and on CPU
+                model.eval()
+                if hasattr(model, 'to'):
+                    model.to(self.device)
+                
+                self.model = model
+                self.model_name = model_name
+                self.backend = backend
+                self._setup_fast_encode()
+                self.model_info = self._build_model_info()
+                
+                load_time = time.time() - start_time
+                logger.info(
+                    f"Model {model_name} loaded successfully with {backend} backend in {load_time:.2f} seconds"
+                )
+                
+            except Exception as e:
+                logger.error(f"Failed to load model {model_name}: {str(e)}")
+                raise RuntimeError(f"Failed to load model {model_name}: {str(e)}")
+
+    def prefetch_weights(self, model_name: Optional[str] = None) -> int:
+        """Ask the kernel to start reading a cached model's weight files into the page cache.
+
+        Returns the number of files hinted. Safe to run in a background thread
+        while the model is loaded; a model that is not cached yet is a no-op.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return 0
+        
+        model_name = model_name or self._default_model_name
+        # Local model directory, sentence-transformers' own cache layout and
+        # the Hugging Face hub cache layout
+        roots = [model_name, os.path.join(self._cache_dir, model_name.replace("/", "_"))]
+        roots += glob.glob(
+            os.path.join(self._cache_dir, f"models--{model_name.replace('/', '--')}", "snapshots", "*")
+        )
         
+        prefetched = 0
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if not filename.endswith(WEIGHT_FILE_SUFFIXES):
+                        continue
+                    try:
+                        fd = os.open(os.path.join(dirpath, filename), os.O_RDONLY)
+                        try:
+                            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                        finally:
+                            os.close(fd)
+                        prefetched += 1
+                    except OSError as e:
+                        logger.debug("Could not prefetch %s: %s", filename, e)
+        
+        if prefetched:
+            logger.info(f"Prefetching {prefetched} weight files for model {model_name}")
+        return prefetched
+
+    def _configure_threads(self, torch) -> None:
+        """Size torch's thread pools once, before any inference runs."""
+        torch.set_num_threads(self.num_threads)
+        # Batches are processed one at a time, so inter-op parallelism only adds contention
+        if torch.get_num_interop_threads() != 1:
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError as e:
+                logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+        logger.info(f"Using {self.num_threads} torch threads")
+
+    def _ensure_fast_tokenizer(self, model: "SentenceTransformer") -> None:
+        """Replace a slow Python tokenizer with the Rust-backed fast one, if the model has it."""
+        tokenizer = model.tokenizer
+        if getattr(tokenizer, "is_fast", True):
+            return
+
+        from transformers import AutoTokenizer
+
         try:
-            logger.info(f"Loading model: {model_name}")
-            start_time = time.time()
-            
-            # Load model with CPU-only configuration
-            self.model = SentenceTransformer(
-                model_name,
-                cache_folder=self.settings.model_cache_dir,
-                device=self.device
+            model.tokenizer = AutoTokenizer.from_pretrained(
+                tokenizer.name_or_path, cache_dir=self._cache_dir, use_fast=True
             )
-            
-            # Ensure model is in evaluation mode and on CPU
-            self.model.eval()
-            if hasattr(self.model, 'to'):
-                self.model.to(self.device)
-            
-            self.model_name = model_name
-            
-            load_time = time.time() - start_time
-            logger.info(f"Model {model_name} loaded successfully in {load_time:.2f} seconds")
-            
         except Exception as e:
-            logger.error(f"Failed to load model {model_name}: {str(e)}")
-            raise RuntimeError(f"Failed to load model {model_name}: {str(e)}")
+            logger.warning(f"No fast tokenizer available, using the slow tokenizer: {str(e)}")
+            return
 
-    def generate_embeddings(
+        if model.tokenizer.is_fast:
+            logger.info("Switched to the fast (Rust) tokenizer")
+        else:
+            # from_pretrained silently falls back when no fast version exists
+            model.tokenizer = tokenizer
+            logger.warning("No fast tokenizer available, using the slow tokenizer")
+
+    def _optimize_transformer(self, model: "SentenceTransformer") -> None:
+        """Swap the underlying transformer for fused-kernel and/or compiled versions."""
+        from sentence_transformers import models
+
+        transformer_module = model._first_module()
+        if not isinstance(transformer_module, models.Transformer):
+            return
+
+        inner = transformer_module.auto_model
+        if self._use_bettertransformer:
+            try:
+                from optimum.bettertransformer import BetterTransformer
+
+                inner = BetterTransformer.transform(inner, keep_original_model=False)
+                logger.info("Using BetterTransformer fused attention kernels")
+            except ImportError:
+                logger.info("optimum is not installed, skipping BetterTransformer")
+            except Exception as e:
+                logger.warning(f"BetterTransformer is not supported for this model: {str(e)}")
+
+        if self._torch_compile:
+            # Compilation happens lazily on the first forward pass (the startup warmup)
+            inner = self._torch.compile(inner, dynamic=True)
+            logger.info("Compiled transformer with torch.compile")
+
+        transformer_module.auto_model = inner
+
+    def _load_onnx_model(self, model_name: str) -> "SentenceTransformer":
+        """Load a model served by ONNX Runtime on CPU (sentence-transformers>=3.2)."""
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = self.num_threads
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        return SentenceTransformer(
+            model_name,
+            cache_folder=self._cache_dir,
+            device=self.device,
+            backend="onnx",
+            model_kwargs={
+                "file_name": self._onnx_file_name,
+                "provider": "CPUExecutionProvider",
+                "session_options": session_options
+            }
+        )
+
+    def _setup_fast_encode(self) -> None:
+        """Stash the tokenizer and transformer if the model can bypass SentenceTransformer.encode.
+
+        Only plain Transformer -> mean Pooling (-> Normalize) PyTorch pipelines
+        qualify, since those are what _tokenize + _forward reproduce exactly.
+        """
+        self._tokenizer = None
+        self._transformer = None
+
+        if not self._fast_encode or self.backend != "torch":
+            return
+
+        from sentence_transformers import models
+
+        modules = list(self.model)
+        has_normalize = len(modules) == 3 and isinstance(modules[2], models.Normalize)
+        if not (
+            len(modules) in (2, 3)
+            and type(modules[0]) is models.Transformer
+            and isinstance(modules[1], models.Pooling)
+            and modules[1].get_pooling_mode_str() == "mean"
+            and (len(modules) == 2 or has_normalize)
+        ):
+            logger.info(f"Model {self.model_name} uses a custom pipeline, fast encode path disabled")
+            return
+
+        transformer_module = modules[0]
+        self._tokenizer = transformer_module.tokenizer
+        self._transformer = transformer_module.auto_model
+        self._lower_case = transformer_module.do_lower_case
+        self._max_seq_length = transformer_module.max_seq_length
+        self._always_normalize = has_normalize
+
+    def _tokenize(self, texts: List[str]) -> dict:
+        """Tokenize texts into model inputs for _forward."""
+        # Match SentenceTransformer's own preprocessing
+        texts = [text.strip() for text in texts]
+        if self._lower_case:
+            texts = [text.lower() for text in texts]
+
+        encoded = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self._max_seq_length,
+            return_tensors="pt"
+        )
+        return {
+            key: encoded[key]
+            for key in ("input_ids", "attention_mask", "token_type_ids")
+            if key in encoded
+        }
+
+    def _forward(self, features: dict, normalize: bool) -> np.ndarray:
+        """Run the transformer and mean-pool without SentenceTransformer.encode overhead."""
+        torch = self._torch
+        with torch.inference_mode():
+            token_embeddings = self._transformer(**features, return_dict=False)[0]
+
+            # Mean pooling over non-padding tokens
+            mask = features["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+            embeddings = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+            if normalize or self._always_normalize:
+                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+
+        return embeddings.numpy()
+
+    def encode(
         self,
         texts: List[str],
         model_name: Optional[str] = None,
         normalize: bool = True,
         batch_size: Optional[int] = None
-    ) -> Tuple[List[List[float]], float]:
-        """Generate embeddings for a list of texts."""
+    ) -> Tuple[np.ndarray, float]:
+        """Generate embeddings for a list of texts as a float32 array of shape (n, dim)."""
         if not texts:
             raise ValueError("Texts list cannot be empty")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Batch size must be positive")
         
+        with self._lock:
+            return self._encode(texts, model_name, normalize, batch_size)
+
+    def _encode(
+        self,
+        texts: List[str],
+        model_name: Optional[str],
+        normalize: bool,
+        batch_size: Optional[int]
+    ) -> Tuple[np.ndarray, float]:
+        """Generate embeddings; the caller must hold the service lock."""
         # Load model if needed
         self.load_model(model_name)
         
@@ -79,40 +351,196 @@ class EmbeddingService:
             raise RuntimeError("Model is not loaded")
         
         # Use provided batch size or default
-        batch_size = batch_size or self.settings.max_batch_size
+        batch_size = batch_size or self._max_batch
         
         try:
             logger.info(f"Generating embeddings for {len(texts)} texts using model {self.model_name}")
             start_time = time.time()
             
-            # Generate embeddings in batches
-            all_embeddings = []
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                logger.debug(f"Processing batch {i//batch_size + 1}: {len(batch_texts)} texts")
-                
-                # Generate embeddings for the batch
-                batch_embeddings = self.model.encode(
-                    batch_texts,
-                    convert_to_tensor=False,
-                    normalize_embeddings=normalize,
-                    show_progress_bar=False
-                )
-                
-                all_embeddings.extend(batch_embeddings.tolist())
+            # Encode each distinct text once, then gather rows back into input order
+            unique_texts, inverse = self._deduplicate(texts)
+            if self._cache_max > 0:
+                embeddings = self._encode_cached(unique_texts, normalize, batch_size)
+            else:
+                embeddings = self._encode_batches(unique_texts, normalize, batch_size)
+            if len(unique_texts) < len(texts):
+                logger.debug("Encoded %d unique texts out of %d", len(unique_texts), len(texts))
+                embeddings = embeddings[inverse]
             
             processing_time = time.time() - start_time
             logger.info(f"Generated embeddings for {len(texts)} texts in {processing_time:.2f} seconds")
             
-            return all_embeddings, processing_time
+            return embeddings, processing_time
             
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {str(e)}")
             raise RuntimeError(f"Failed to generate embeddings: {str(e)}")
 
+    @staticmethod
+    def _deduplicate(texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Return the distinct texts in first-seen order and each input's index into them."""
+        seen: Dict[str, int] = {}
+        inverse = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            inverse[i] = seen.setdefault(text, len(seen))
+        return list(seen), inverse
+
+    def _encode_cached(self, texts: List[str], normalize: bool, batch_size: int) -> np.ndarray:
+        """Serve embeddings from the LRU cache and encode only the misses."""
+        keys = [(self.model_name, normalize, text) for text in texts]
+        cached = [self._cache.get(key) for key in keys]
+        miss_indices = [i for i, embedding in enumerate(cached) if embedding is None]
+        
+        hits = len(texts) - len(miss_indices)
+        self.cache_hits += hits
+        self.cache_misses += len(miss_indices)
+        if hits:
+            logger.debug("Embedding cache hits: %d/%d", hits, len(texts))
+            for i, key in enumerate(keys):
+                if cached[i] is not None:
+                    self._cache.move_to_end(key)
+        
+        # Fill one preallocated (n, dim) array: miss rows straight from the
+        # batch buffer, hit rows from the cache
+        if not miss_indices:
+            embeddings = np.empty((len(texts), cached[0].shape[0]), dtype=np.float32)
+        else:
+            miss_embeddings = self._encode_batches([texts[i] for i in miss_indices], normalize, batch_size)
+            if hits:
+                embeddings = np.empty((len(texts), miss_embeddings.shape[1]), dtype=np.float32)
+                embeddings[miss_indices] = miss_embeddings
+            else:
+                embeddings = miss_embeddings
+            for i, embedding in zip(miss_indices, miss_embeddings):
+                # Copy so a cached row does not keep the whole batch buffer alive
+                self._cache[keys[i]] = embedding.copy()
+            while len(self._cache) > self._cache_max:
+                self._cache.popitem(last=False)
+        
+        if hits:
+            for i, embedding in enumerate(cached):
+                if embedding is not None:
+                    embeddings[i] = embedding
+        
+        return embeddings
+
+    def _encode_batches(self, texts: List[str], normalize: bool, batch_size: int) -> np.ndarray:
+        """Run the model over texts in batches of batch_size."""
+        if self._bucket_by_length and len(texts) > batch_size:
+            # Batch texts of similar length together so short texts are not
+            # padded to the longest one; character length approximates tokens
+            order = np.argsort([len(text) for text in texts], kind="stable")
+        else:
+            order = np.arange(len(texts))
+        
+        batches = [order[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        
+        # On the fast path, tokenize batch k + 1 on a helper thread while batch
+        # k runs through the model (both release the GIL)
+        pipelined = self._transformer is not None and len(batches) > 1
+        if pipelined:
+            next_features = self._tokenizer_pool.submit(self._tokenize, [texts[j] for j in batches[0]])
+        
+        # Write every batch into a single contiguous buffer (at the texts'
+        # original positions), allocated once the first batch tells us the
+        # embedding dimension
+        embeddings: Optional[np.ndarray] = None
+        try:
+            for k, batch_indices in enumerate(batches):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Processing batch %d: %d texts", k + 1, len(batch_indices))
+                
+                # Generate embeddings for the batch
+                if pipelined:
+                    features = next_features.result()
+                    if k + 1 < len(batches):
+                        next_features = self._tokenizer_pool.submit(
+                            self._tokenize, [texts[j] for j in batches[k + 1]]
+                        )
+                    batch_embeddings = self._forward(features, normalize)
+                elif self._transformer is not None:
+                    batch_embeddings = self._forward(self._tokenize([texts[j] for j in batch_indices]), normalize)
+                else:
+                    batch_texts = [texts[j] for j in batch_indices]
+                    with self._torch.inference_mode():
+                        batch_embeddings = self.model.encode(
+                            batch_texts,
+                            convert_to_numpy=True,
+                            normalize_embeddings=normalize,
+                            show_progress_bar=False
+                        )
+                
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+                embeddings[batch_indices] = batch_embeddings
+        finally:
+            # If a forward pass raised, don't leave the next batch tokenizing in
+            # the background: the shared fast tokenizer is not reentrant
+            if pipelined and not next_features.cancel():
+                wait([next_features])
+        
+        if embeddings is None:
+            raise ValueError(f"No batches produced for {len(texts)} texts with batch size {batch_size}")
+        return embeddings
+
+    def get_cache_stats(self) -> dict:
+        """Get embedding cache statistics."""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "size": len(self._cache),
+            "max_size": self._cache_max,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0
+        }
+
+    def iter_encode_batches(
+        self,
+        texts: List[str],
+        model_name: Optional[str] = None,
+        normalize: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (start index, embeddings) for consecutive batches of texts.
+
+        Only one batch of embeddings is held at a time, so callers can stream
+        results without buffering the whole request.
+        """
+        if not texts:
+            raise ValueError("Texts list cannot be empty")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Batch size must be positive")
+        
+        batch_size = batch_size or self._max_batch
+        for start in range(0, len(texts), batch_size):
+            embeddings, _ = self.encode(
+                texts[start:start + batch_size],
+                model_name=model_name,
+                normalize=normalize,
+                batch_size=batch_size
+            )
+            yield start, embeddings
+
+    def generate_embeddings(
+        self,
+        texts: List[str],
+        model_name: Optional[str] = None,
+        normalize: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Tuple[List[List[float]], float]:
+        """Generate embeddings for a list of texts."""
+        embeddings, processing_time = self.encode(
+            texts,
+            model_name=model_name,
+            normalize=normalize,
+            batch_size=batch_size
+        )
+        # Convert to Python floats once, for the whole request
+        return embeddings.tolist(), processing_time
+
     def get_model_info(self) -> dict:
         """Get information about the currently loaded model."""
-        if self.model is None:
+        if self.model_info is None:
             return {
                 "model_name": None,
                 "model_type": None,
@@ -121,35 +549,22 @@ class EmbeddingService:
                 "is_loaded": False
             }
         
-        try:
-            # Get model dimensions
-            if hasattr(self.model, 'get_sentence_embedding_dimension'):
-                dimensions = self.model.get_sentence_embedding_dimension()
-            else:
-                # Fallback: generate a test embedding to get dimensions
-                test_embedding = self.model.encode(["test"])
-                dimensions = len(test_embedding[0])
-            
-            # Get max sequence length
-            max_length = getattr(self.model, 'max_seq_length', self.settings.max_sequence_length)
-            
-            return {
-                "model_name": self.model_name,
-                "model_type": "sentence-transformer",
-                "max_sequence_length": max_length,
-                "embedding_dimensions": dimensions,
-                "is_loaded": True
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to get model info: {str(e)}")
-            return {
-                "model_name": self.model_name,
-                "model_type": "sentence-transformer",
-                "max_sequence_length": self.settings.max_sequence_length,
-                "embedding_dimensions": None,
-                "is_loaded": False
-            }
+        return dict(self.model_info)
+
+    def _build_model_info(self) -> dict:
+        """Collect metadata about the loaded model, once at load time."""
+        dimensions = self.model.get_sentence_embedding_dimension()
+        if dimensions is None:
+            # Fallback: generate a test embedding to get dimensions
+            dimensions = len(self.model.encode(["test"])[0])
+        
+        return {
+            "model_name": self.model_name,
+            "model_type": "sentence-transformer",
+            "max_sequence_length": getattr(self.model, 'max_seq_length', None) or self._max_seq,
+            "embedding_dimensions": dimensions,
+            "is_loaded": True
+        }
 
     def is_model_loaded(self) -> bool:
         """Check if a model is currently loaded."""
@@ -157,19 +572,27 @@ class EmbeddingService:
 
     def unload_model(self) -> None:
         """Unload the current model to free memory."""
-        if self.model is not None:
+        with self._lock:
+            if self.model is None:
+                return
+            
             logger.info(f"Unloading model: {self.model_name}")
             del self.model
             self.model = None
             self.model_name = None
+            self.backend = None
+            self.model_info = None
+            self._tokenizer = None
+            self._transformer = None
+            self._cache.clear()
             
             # Force garbage collection
             import gc
             gc.collect()
             
             # Clear CUDA cache if available
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            if self._torch is not None and self._torch.cuda.is_available():
+                self._torch.cuda.empty_cache()
 
 
 # Global service instance
@@ -18,6 +18,10 @@ def setup_logging(log_level: Optional[str] = None) -> logging.Logger:
     logger = logging.getLogger("embeddings_generator")
     logger.setLevel(getattr(logging, level.upper()))
     
+    # Only install the handler once, even if logging is set up again
+    if logger.handlers:
+        return logger
+    
     # Create formatter
     formatter = logging.Formatter(
         fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -32,7 +36,8 @@ def setup_logging(log_level: Optional[str] = None) -> logging.Logger:
     # Add handler to logger
     logger.addHandler(console_handler)
     
-    # Prevent duplicate logs
+    # Prevent duplicate logs via the root logger; child loggers returned by
+    # get_logger keep propagating to this one and share its handler
     logger.propagate = False
     
     return logger
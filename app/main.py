@@ -1,13 +1,20 @@
 """Main FastAPI application for the embeddings generator."""
 
+import asyncio
+import base64
+import threading
 import time
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import Any, Dict, List
 
+import numpy as np
+import orjson
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 
+from app.batching import batching_engine
 from app.config import get_settings
 from app.embedding_service import embedding_service
 from app.logger import get_logger
@@ -25,18 +32,67 @@ settings = get_settings()
 # Track application start time
 app_start_time = time.time()
 
+# Generous upper bound on characters per token, used to reject oversized texts
+# cheaply; the tokenizer truncates anything past max_sequence_length tokens
+MAX_CHARS_PER_TOKEN = 6
+
+# Set once the startup warmup has finished (immediately if warmup is disabled)
+warmup_done = not settings.warmup_on_startup
+
+
+def warmup_model() -> None:
+    """Load the default model and run a dummy forward pass through it."""
+    global warmup_done
+    try:
+        embedding_service.load_model()
+        embedding_service.generate_embeddings(settings.warmup_texts, normalize=True)
+        logger.info("Model warmup completed")
+    except Exception as e:
+        # A failed warmup must not block startup; the first request retries the load
+        logger.error(f"Model warmup failed: {str(e)}")
+    finally:
+        warmup_done = True
+
+
+def embeddings_to_base64(embeddings: np.ndarray, encoding: str) -> str:
+    """Encode an embeddings array as base64 of its raw float32/float16 bytes."""
+    dtype = np.float16 if encoding == "base64_f16" else np.float32
+    return base64.b64encode(embeddings.astype(dtype, copy=False).tobytes()).decode("ascii")
+
+
+def check_text_lengths(texts: List[str]) -> None:
+    """Reject texts that are certain to exceed the model's token limit."""
+    max_chars = settings.max_sequence_length * MAX_CHARS_PER_TOKEN
+    oversized = next((i for i, text in enumerate(texts) if len(text) > max_chars), None)
+    if oversized is not None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Text at index {oversized} exceeds maximum length of {max_chars} characters"
+        )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info("Starting Embeddings Generator API")
-    logger.info("Model will be loaded on first request to optimize startup time")
+    # Start reading cached weights from disk while the rest of startup runs
+    threading.Thread(target=embedding_service.prefetch_weights, daemon=True).start()
+    batching_engine.start()
+    warmup_task = None
+    if settings.warmup_on_startup:
+        logger.info("Warming up model in the background")
+        warmup_task = asyncio.create_task(asyncio.to_thread(warmup_model))
+    else:
+        logger.info("Model will be loaded on first request to optimize startup time")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Embeddings Generator API")
+    await batching_engine.stop()
+    if warmup_task is not None:
+        await warmup_task
     embedding_service.unload_model()
 
 
@@ -47,6 +103,7 @@ app = FastAPI(
     description="A framework for generating embeddings using Docker containers with CPU-only models from Hugging Face",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -66,7 +123,7 @@ async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {str(exc)}")
     return JSONResponse(
         status_code=500,
-        content=ErrorResponse(
+        content=ErrorResponse.model_construct(
             error="Internal server error",
             detail=str(exc) if settings.debug else None,
             status_code=500
@@ -91,16 +148,18 @@ async def health_check():
     uptime = time.time() - app_start_time
     model_loaded = embedding_service.is_model_loaded()
     
-    # Consider the service healthy even if model is not loaded yet
-    # The model will be loaded on first request
-    status = "healthy"
+    # Report "starting" until the startup warmup has finished; afterwards the
+    # service is healthy even if the model failed to load (first request retries)
+    status = "healthy" if warmup_done else "starting"
     
-    return HealthResponse(
-        status=status,
-        version=settings.app_version,
-        model_loaded=model_loaded,
-        uptime=uptime
-    )
+    # Returned directly: response_model documents the schema, but a returned
+    # model would be re-validated and re-serialized on every health probe
+    return ORJSONResponse(content={
+        "status": status,
+        "version": settings.app_version,
+        "model_loaded": model_loaded,
+        "uptime": uptime
+    })
 
 
 @app.get("/model/info", response_model=ModelInfo)
@@ -116,7 +175,7 @@ async def get_model_info():
                 detail="No model is currently loaded. Model will be loaded on first embedding request."
             )
         
-        return ModelInfo(**model_info)
+        return ORJSONResponse(content=model_info)
     except HTTPException:
         raise
     except Exception as e:
@@ -129,31 +188,35 @@ async def generate_embeddings(request: EmbeddingRequest):
     """Generate embeddings for the provided texts."""
     try:
         # Check text lengths
-        for i, text in enumerate(request.texts):
-            if len(text) > settings.max_sequence_length:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Text at index {i} exceeds maximum length of {settings.max_sequence_length} characters"
-                )
+        check_text_lengths(request.texts)
         
-        # Generate embeddings
-        embeddings, processing_time = embedding_service.generate_embeddings(
+        # Generate embeddings as a float32 array, batched with concurrent requests
+        embeddings, processing_time = await batching_engine.submit(
             texts=request.texts,
             model_name=request.model_name,
             normalize=request.normalize,
             batch_size=request.batch_size
         )
         
-        # Get model info for response
-        model_info = embedding_service.get_model_info()
+        # Describe the result from the request and the array itself rather than
+        # the service's current model, which a concurrent request may have changed
+        content = {
+            "embeddings": None,
+            "embeddings_b64": None,
+            "model_name": request.model_name or settings.default_model_name,
+            "dimensions": embeddings.shape[1],
+            "processing_time": processing_time,
+            "total_texts": len(request.texts)
+        }
+        if request.encoding == "json":
+            content["embeddings"] = embeddings
+        else:
+            content["embeddings_b64"] = embeddings_to_base64(embeddings, request.encoding)
         
-        return EmbeddingResponse(
-            embeddings=embeddings,
-            model_name=model_info["model_name"],
-            dimensions=model_info["embedding_dimensions"],
-            processing_time=processing_time,
-            total_texts=len(request.texts)
-        )
+        # Return the response directly so FastAPI skips validating it against
+        # EmbeddingResponse; orjson serializes the ndarray without creating
+        # intermediate Python floats
+        return ORJSONResponse(content=content)
         
     except HTTPException:
         raise
@@ -162,11 +225,63 @@ async def generate_embeddings(request: EmbeddingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/embeddings/stream")
+async def stream_embeddings(request: EmbeddingRequest):
+    """Stream embeddings as NDJSON, one {"i": index, "v": vector} object per line.
+
+    Lines are written as each batch completes, so the server never holds more
+    than one batch of embeddings. The encoding field is ignored.
+    """
+    try:
+        check_text_lengths(request.texts)
+        
+        # Load the model up front so a load failure is still reported as an
+        # error status rather than a truncated stream
+        await run_in_threadpool(embedding_service.load_model, request.model_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to stream embeddings: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    def generate_lines():
+        # A sync generator, so Starlette iterates it in the threadpool
+        try:
+            for start, embeddings in embedding_service.iter_encode_batches(
+                texts=request.texts,
+                model_name=request.model_name,
+                normalize=request.normalize,
+                batch_size=request.batch_size
+            ):
+                yield b"".join(
+                    orjson.dumps({"i": start + offset, "v": embedding}, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+                    for offset, embedding in enumerate(embeddings)
+                )
+        except Exception as e:
+            logger.error(f"Failed to stream embeddings: {str(e)}")
+            raise
+    
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_model=Dict[str, Any])
+async def metrics():
+    """Service metrics, including embedding cache statistics."""
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    
+    return {
+        "uptime": time.time() - app_start_time,
+        "model_loaded": embedding_service.is_model_loaded(),
+        "cache": embedding_service.get_cache_stats()
+    }
+
+
 @app.post("/model/load")
 async def load_model(model_name: str):
     """Load a specific model."""
     try:
-        embedding_service.load_model(model_name)
+        await run_in_threadpool(embedding_service.load_model, model_name)
         return {"message": f"Model {model_name} loaded successfully"}
     except Exception as e:
         logger.error(f"Failed to load model {model_name}: {str(e)}")
@@ -177,7 +292,7 @@ async def load_model(model_name: str):
 async def unload_model():
     """Unload the current model."""
     try:
-        embedding_service.unload_model()
+        await run_in_threadpool(embedding_service.unload_model)
         return {"message": "Model unloaded successfully"}
     except Exception as e:
         logger.error(f"Failed to unload model: {str(e)}")
@@ -187,11 +302,14 @@ async def unload_model():
 if __name__ == "__main__":
     import uvicorn
     
+    # CPU-bound inference scales with worker processes rather than threads;
+    # reload only works with a single worker, so debug mode forces one
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
         workers=1 if settings.debug else settings.workers,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        access_log=False
     )
@@ -1,13 +1,15 @@
 """Pydantic models for request/response schemas."""
 
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class EmbeddingRequest(BaseModel):
     """Request model for generating embeddings."""
 
+    model_config = ConfigDict(defer_build=True)
+
     texts: List[str] = Field(
         ..., 
         description="List of texts to generate embeddings for",
@@ -24,16 +26,31 @@ class EmbeddingRequest(BaseModel):
     )
     batch_size: Optional[int] = Field(
         default=None,
+        gt=0,
         description="Batch size for processing. If not provided, uses default batch size."
     )
+    encoding: Literal["json", "base64_f32", "base64_f16"] = Field(
+        default="json",
+        description=(
+            "Response encoding. 'json' returns embeddings as nested lists of floats; "
+            "'base64_f32'/'base64_f16' return embeddings_b64, the row-major float32/float16 "
+            "bytes of the (total_texts, dimensions) array, base64-encoded."
+        )
+    )
 
 
 class EmbeddingResponse(BaseModel):
     """Response model for embedding generation."""
 
-    embeddings: List[List[float]] = Field(
-        ...,
-        description="List of embedding vectors, one for each input text"
+    model_config = ConfigDict(defer_build=True)
+
+    embeddings: Optional[List[List[float]]] = Field(
+        default=None,
+        description="List of embedding vectors, one for each input text (json encoding)"
+    )
+    embeddings_b64: Optional[str] = Field(
+        default=None,
+        description="Base64-encoded raw embedding bytes (base64_f32/base64_f16 encodings)"
     )
     model_name: str = Field(
         ...,
@@ -56,6 +73,8 @@ class EmbeddingResponse(BaseModel):
 class HealthResponse(BaseModel):
     """Health check response model."""
 
+    model_config = ConfigDict(defer_build=True)
+
     status: str = Field(..., description="Service status")
     version: str = Field(..., description="Application version")
     model_loaded: bool = Field(..., description="Whether the default model is loaded")
@@ -65,6 +84,8 @@ class HealthResponse(BaseModel):
 class ModelInfo(BaseModel):
     """Model information response model."""
 
+    model_config = ConfigDict(defer_build=True)
+
     model_name: str = Field(..., description="Name of the model")
     model_type: str = Field(..., description="Type of the model")
     max_sequence_length: int = Field(..., description="Maximum sequence length supported")
@@ -75,6 +96,8 @@ class ModelInfo(BaseModel):
 class ErrorResponse(BaseModel):
     """Error response model."""
 
+    model_config = ConfigDict(defer_build=True)
+
     error: str = Field(..., description="Error message")
     detail: Optional[str] = Field(default=None, description="Detailed error information")
     status_code: int = Field(..., description="HTTP status code")
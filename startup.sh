@@ -36,7 +36,8 @@ if pytest tests/ -v --tb=short --no-header; then
     echo ""
     
     # Start the main application
-    exec python -m uvicorn app.main:app --host 0.0.0.0 --port 8000
+    exec python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 \
+        --workers "${WORKERS:-1}" --no-access-log
 else
     # Calculate test duration even on failure
     end_time=$(date +%s)
@@ -0,0 +1,76 @@
+"""Tests for the dynamic batching engine."""
+
+import asyncio
+
+import numpy as np
+
+from app.batching import BatchingEngine
+
+
+class FakeService:
+    """Stand-in for EmbeddingService that records encode calls."""
+
+    def __init__(self, malformed_calls=0):
+        self.calls = []
+        self.malformed_calls = malformed_calls
+
+    def encode(self, texts, model_name=None, normalize=True, batch_size=None):
+        self.calls.append(list(texts))
+        if len(self.calls) <= self.malformed_calls:
+            return None, 0.01
+        embeddings = np.array([[float(len(text)), float(normalize)] for text in texts], dtype=np.float32)
+        return embeddings, 0.01
+
+
+def test_concurrent_requests_share_one_encode_call():
+    """Test that concurrent requests are coalesced and split back correctly."""
+    service = FakeService()
+    engine = BatchingEngine(service, max_batch_size=32, max_wait_ms=50)
+
+    async def run():
+        results = await asyncio.gather(
+            engine.submit(["a", "bb"]),
+            engine.submit(["ccc"]),
+        )
+        await engine.stop()
+        return results
+
+    (first, _), (second, _) = asyncio.run(run())
+    assert service.calls == [["a", "bb", "ccc"]]
+    assert first[:, 0].tolist() == [1.0, 2.0]
+    assert second[:, 0].tolist() == [3.0]
+
+
+def test_requests_with_different_parameters_are_not_mixed():
+    """Test that requests are only batched with compatible parameters."""
+    service = FakeService()
+    engine = BatchingEngine(service, max_batch_size=32, max_wait_ms=50)
+
+    async def run():
+        results = await asyncio.gather(
+            engine.submit(["a"], normalize=True),
+            engine.submit(["b"], normalize=False),
+        )
+        await engine.stop()
+        return results
+
+    (normalized, _), (raw, _) = asyncio.run(run())
+    assert sorted(service.calls) == [["a"], ["b"]]
+    assert normalized[0, 1] == 1.0
+    assert raw[0, 1] == 0.0
+
+
+def test_malformed_result_fails_requests_and_keeps_worker_running():
+    """Test that a result that cannot be split fails its requests without stalling later ones."""
+    service = FakeService(malformed_calls=1)
+    engine = BatchingEngine(service, max_batch_size=32, max_wait_ms=50)
+
+    async def run():
+        failed = await asyncio.gather(engine.submit(["a"]), engine.submit(["bb"]), return_exceptions=True)
+        succeeded = await asyncio.wait_for(engine.submit(["ccc"]), timeout=5)
+        await engine.stop()
+        return failed, succeeded
+
+    failed, (embeddings, _) = asyncio.run(run())
+    assert all(isinstance(result, Exception) for result in failed)
+    assert embeddings[:, 0].tolist() == [3.0]
@@ -0,0 +1,335 @@
+"""Tests for the embedding service."""
+
+import os
+import subprocess
+import sys
+import time
+import types
+
+import numpy as np
+import pytest
+import sentence_transformers
+import torch
+from sentence_transformers import SentenceTransformer, models
+from transformers import AutoTokenizer, BertConfig, BertModel, BertTokenizerFast
+
+from app.embedding_service import EmbeddingService
+
+
+class FakeModel:
+    """Stand-in for SentenceTransformer that records the texts it encodes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), float(normalize_embeddings)] for text in texts], dtype=np.float32)
+
+
+def make_service() -> EmbeddingService:
+    """Create a service with a fake model already loaded."""
+    service = EmbeddingService()
+    service.model = FakeModel()
+    service.model_name = "fake-model"
+    service._torch = torch
+    return service
+
+
+def test_encode_returns_float32_array_in_input_order():
+    """Test that encode returns one row per text, in order."""
+    service = make_service()
+    embeddings, processing_time = service.encode(["a", "bbb", "cc"], model_name="fake-model", batch_size=2)
+    assert embeddings.dtype == np.float32
+    assert embeddings[:, 0].tolist() == [1.0, 3.0, 2.0]
+    assert processing_time >= 0
+
+
+def test_encode_batches_texts_by_length():
+    """Test that batches group similar lengths and rows keep their input positions."""
+    service = make_service()
+    service._cache_max = 0
+    embeddings, _ = service.encode(["aaaaa", "b", "cccc", "dd"], model_name="fake-model", batch_size=2)
+
+    assert service.model.calls == [["b", "dd"], ["cccc", "aaaaa"]]
+    assert embeddings[:, 0].tolist() == [5.0, 1.0, 4.0, 2.0]
+
+
+def test_encode_rejects_non_positive_batch_size():
+    """Test that a negative batch size is an error rather than an empty result."""
+    service = make_service()
+    with pytest.raises(ValueError):
+        service.encode(["a"], model_name="fake-model", batch_size=-1)
+    with pytest.raises(ValueError):
+        service._encode_batches(["a"], True, -1)
+
+
+def test_encode_deduplicates_texts_within_request():
+    """Test that duplicate texts are encoded once and returned for every position."""
+    service = make_service()
+    service._cache_max = 0
+    embeddings, _ = service.encode(["a", "bb", "a", "bb", "ccc"], model_name="fake-model")
+
+    assert service.model.calls == [["a", "bb", "ccc"]]
+    assert embeddings[:, 0].tolist() == [1.0, 2.0, 1.0, 2.0, 3.0]
+
+
+def test_encode_serves_repeated_texts_from_cache():
+    """Test that only cache misses reach the model."""
+    service = make_service()
+    service.encode(["a", "bb"], model_name="fake-model")
+    embeddings, _ = service.encode(["bb", "ccc", "a"], model_name="fake-model")
+
+    assert service.model.calls == [["a", "bb"], ["ccc"]]
+    assert embeddings[:, 0].tolist() == [2.0, 3.0, 1.0]
+    stats = service.get_cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+
+
+def test_cached_rows_are_independent_of_returned_arrays():
+    """Test that writing to a returned array does not corrupt the cache."""
+    service = make_service()
+    first, _ = service.encode(["a", "bb"], model_name="fake-model")
+    first[:] = -1.0
+    second, _ = service.encode(["bb", "ccc", "a"], model_name="fake-model")
+    second[:] = -1.0
+    embeddings, _ = service.encode(["a", "bb", "ccc"], model_name="fake-model")
+
+    assert embeddings[:, 0].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_cache_is_keyed_by_normalize_flag():
+    """Test that normalized and raw embeddings are cached separately."""
+    service = make_service()
+    service.encode(["a"], model_name="fake-model", normalize=True)
+    embeddings, _ = service.encode(["a"], model_name="fake-model", normalize=False)
+
+    assert len(service.model.calls) == 2
+    assert embeddings[0, 1] == 0.0
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache stays within its size limit."""
+    service = make_service()
+    service._cache_max = 2
+    service.encode(["a", "b"], model_name="fake-model")
+    service.encode(["a"], model_name="fake-model")
+    service.encode(["c"], model_name="fake-model")
+    service.encode(["a", "b"], model_name="fake-model")
+
+    assert service.get_cache_stats()["size"] == 2
+    assert service.model.calls[-1] == ["b"]
+
+
+TINY_TEXTS = [
+    "the quick brown fox",
+    "  jumps over the lazy dog ",
+    "the dog",
+    "quick quick quick brown fox jumps over the lazy dog",
+    "fox",
+]
+
+
+def build_tiny_model(path, pooling_mode: str = "mean") -> str:
+    """Save a tiny randomly initialised BERT sentence-transformer, without network access."""
+    words = sorted({word for text in TINY_TEXTS for word in text.split()})
+    vocab_file = path / "vocab.txt"
+    vocab_file.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=5 + len(words),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64
+    )
+    bert_dir = str(path / "bert")
+    BertModel(config).save_pretrained(bert_dir)
+    BertTokenizerFast(vocab_file=str(vocab_file)).save_pretrained(bert_dir)
+
+    modules = [models.Transformer(bert_dir, max_seq_length=32), models.Pooling(32, pooling_mode)]
+    if pooling_mode == "mean":
+        modules.append(models.Normalize())
+    model_dir = str(path / f"tiny-{pooling_mode}")
+    SentenceTransformer(modules=modules, device="cpu").save(model_dir)
+    return model_dir
+
+
+@pytest.mark.parametrize("normalize", [True, False])
+def test_fast_encode_matches_sentence_transformer(tmp_path, normalize):
+    """Test that the fast path reproduces SentenceTransformer.encode."""
+    model_dir = build_tiny_model(tmp_path)
+    service = EmbeddingService()
+    embeddings, _ = service.encode(TINY_TEXTS, model_name=model_dir, normalize=normalize)
+
+    assert service._transformer is not None
+    expected = SentenceTransformer(model_dir, device="cpu").encode(TINY_TEXTS, normalize_embeddings=normalize)
+    np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+
+
+def test_pipelined_fast_encode_matches_sentence_transformer(tmp_path):
+    """Test that tokenizing the next batch during the forward pass keeps results exact."""
+    model_dir = build_tiny_model(tmp_path)
+    service = EmbeddingService()
+    embeddings, _ = service.encode(TINY_TEXTS, model_name=model_dir, batch_size=2)
+
+    expected = SentenceTransformer(model_dir, device="cpu").encode(TINY_TEXTS, normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+
+
+def test_failed_forward_waits_for_pending_tokenization(tmp_path):
+    """Test that no tokenization is left running after a forward pass raises."""
+    service = EmbeddingService()
+    service.load_model(build_tiny_model(tmp_path))
+    tokenize = service._tokenize
+    pool = service._tokenizer_pool
+    futures = []
+
+    def slow_tokenize(texts):
+        time.sleep(0.2)
+        return tokenize(texts)
+
+    def recording_submit(fn, *args):
+        futures.append(pool.submit(fn, *args))
+        return futures[-1]
+
+    def failing_forward(features, normalize):
+        raise RuntimeError("forward failed")
+
+    service._tokenize = slow_tokenize
+    service._forward = failing_forward
+    service._tokenizer_pool = types.SimpleNamespace(submit=recording_submit)
+    with pytest.raises(RuntimeError):
+        service.encode(TINY_TEXTS, model_name=service.model_name, batch_size=2)
+    assert len(futures) == 2
+    assert all(future.done() for future in futures)
+
+
+def test_load_model_switches_to_fast_tokenizer(tmp_path, monkeypatch):
+    """Test that a model loaded with the slow Python tokenizer gets the fast one."""
+    model_dir = build_tiny_model(tmp_path)
+    from_pretrained = AutoTokenizer.from_pretrained
+
+    def slow_by_default(*args, **kwargs):
+        kwargs.setdefault("use_fast", False)
+        return from_pretrained(*args, **kwargs)
+
+    # sentence-transformers does not pass use_fast, so this loads BertTokenizer
+    monkeypatch.setattr(AutoTokenizer, "from_pretrained", slow_by_default)
+    assert not SentenceTransformer(model_dir, device="cpu").tokenizer.is_fast
+
+    service = EmbeddingService()
+    service.load_model(model_dir)
+    assert service.model.tokenizer.is_fast
+    assert service._tokenizer.is_fast
+
+
+def test_fast_encode_disabled_for_cls_pooling(tmp_path):
+    """Test that pipelines the fast path cannot reproduce use SentenceTransformer.encode."""
+    model_dir = build_tiny_model(tmp_path, pooling_mode="cls")
+    service = EmbeddingService()
+    embeddings, _ = service.encode(TINY_TEXTS, model_name=model_dir)
+
+    assert service._transformer is None
+    expected = SentenceTransformer(model_dir, device="cpu").encode(TINY_TEXTS, normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+
+
+class FakeSentenceTransformer(FakeModel):
+    """Stand-in for the SentenceTransformer constructor that records its arguments."""
+
+    instances = []
+    fail_onnx = False
+
+    def __init__(self, model_name, **kwargs):
+        super().__init__()
+        if kwargs.get("backend") == "onnx" and self.fail_onnx:
+            raise ValueError("model has no ONNX export")
+        self.kwargs = kwargs
+        self.tokenizer = types.SimpleNamespace(is_fast=True)
+        self.max_seq_length = 128
+        FakeSentenceTransformer.instances.append(self)
+
+    def __iter__(self):
+        return iter([])
+
+    def _first_module(self):
+        return None
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def make_onnx_service(monkeypatch, fail_onnx: bool) -> EmbeddingService:
+    """Create a service requesting the ONNX backend, with fake libraries installed."""
+    fake_ort = types.ModuleType("onnxruntime")
+    fake_ort.SessionOptions = types.SimpleNamespace
+    fake_ort.GraphOptimizationLevel = types.SimpleNamespace(ORT_ENABLE_ALL="all")
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_ort)
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", FakeSentenceTransformer)
+    monkeypatch.setattr(FakeSentenceTransformer, "instances", [])
+    monkeypatch.setattr(FakeSentenceTransformer, "fail_onnx", fail_onnx)
+
+    service = EmbeddingService()
+    service._requested_backend = "onnx"
+    return service
+
+
+def test_onnx_backend_loads_model_with_onnx_runtime(monkeypatch):
+    """Test that BACKEND=onnx loads the configured ONNX file on the CPU provider."""
+    service = make_onnx_service(monkeypatch, fail_onnx=False)
+    service.load_model("org/model")
+
+    [model] = FakeSentenceTransformer.instances
+    assert service.backend == "onnx"
+    assert service.get_model_info()["embedding_dimensions"] == 2
+    assert model.kwargs["backend"] == "onnx"
+    model_kwargs = model.kwargs["model_kwargs"]
+    assert model_kwargs["file_name"] == service._onnx_file_name
+    assert model_kwargs["provider"] == "CPUExecutionProvider"
+    assert model_kwargs["session_options"].intra_op_num_threads == service.num_threads
+    assert model_kwargs["session_options"].graph_optimization_level == "all"
+
+
+def test_onnx_backend_falls_back_to_torch(monkeypatch):
+    """Test that a model without an ONNX export is served by PyTorch instead."""
+    service = make_onnx_service(monkeypatch, fail_onnx=True)
+    service.load_model("org/model")
+
+    [model] = FakeSentenceTransformer.instances
+    assert service.backend == "torch"
+    assert "backend" not in model.kwargs
+    assert service.model is model
+
+
+def test_prefetch_weights_finds_cached_weight_files(tmp_path):
+    """Test that weight files in the model cache are prefetched."""
+    service = make_service()
+    service._cache_dir = str(tmp_path)
+    snapshot = tmp_path / "models--org--model" / "snapshots" / "abc123"
+    snapshot.mkdir(parents=True)
+    (snapshot / "model.safetensors").write_bytes(b"\0" * 16)
+    (snapshot / "config.json").write_text("{}")
+
+    expected = 1 if hasattr(os, "posix_fadvise") else 0
+    assert service.prefetch_weights("org/model") == expected
+    assert service.prefetch_weights("org/missing-model") == 0
+
+
+def test_importing_app_does_not_import_torch():
+    """Test that torch is only imported when a model is loaded."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; sys.exit('torch' in sys.modules)"],
+        cwd=project_root
+    )
+    assert result.returncode == 0
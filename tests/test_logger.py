@@ -0,0 +1,19 @@
+"""Tests for the logging configuration."""
+
+import os
+import subprocess
+import sys
+
+
+def test_setup_logging_installs_one_handler():
+    """Test that setting up logging again does not duplicate the handler."""
+    # Run in a fresh interpreter: pytest attaches its own capture handlers
+    # to non-propagating loggers such as ours
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import logging, sys; from app.logger import setup_logging; "
+        "setup_logging(); setup_logging(); "
+        "sys.exit(len(logging.getLogger('embeddings_generator').handlers))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_root)
+    assert result.returncode == 1
@@ -1,9 +1,17 @@
 """Tests for the main FastAPI application."""
 
+import base64
+import json
+from collections import OrderedDict
+
+import numpy as np
 import pytest
+import torch
 from fastapi.testclient import TestClient
 
-from app.main import app
+import app.main as main
+from app.main import app, embeddings_to_base64
+from tests.test_embedding_service import FakeModel
 
 client = TestClient(app)
 
@@ -27,6 +35,21 @@ def test_health_endpoint():
     assert "version" in data
     assert "model_loaded" in data
     assert "uptime" in data
+    assert data["status"] in ["healthy", "starting"]
+
+
+def test_health_becomes_healthy_after_failed_warmup(monkeypatch):
+    """Test that a failed warmup still marks startup as finished."""
+    def failing_generate_embeddings(*args, **kwargs):
+        raise RuntimeError("model download failed")
+
+    monkeypatch.setattr(main, "warmup_done", False)
+    monkeypatch.setattr(main.embedding_service, "generate_embeddings", failing_generate_embeddings)
+
+    assert client.get("/health").json()["status"] == "starting"
+    main.warmup_model()
+    assert main.warmup_done is True
+    assert client.get("/health").json()["status"] == "healthy"
 
 
 def test_model_info_endpoint():
@@ -65,6 +88,71 @@ def test_embeddings_endpoint_too_many_texts():
     assert response.status_code == 422
 
 
+@pytest.mark.parametrize("batch_size", [0, -1])
+def test_embeddings_endpoint_invalid_batch_size(batch_size):
+    """Test embeddings endpoints with a non-positive batch size."""
+    for path in ("/embeddings", "/embeddings/stream"):
+        response = client.post(path, json={"texts": ["test"], "batch_size": batch_size})
+        assert response.status_code == 422
+
+
+def test_embeddings_endpoint_text_too_long():
+    """Test embeddings endpoint with a text far beyond the model's token limit."""
+    response = client.post("/embeddings", json={"texts": ["short", "x" * 100000]})
+    assert response.status_code == 400
+    assert "index 1" in response.json()["detail"]
+
+
+def test_stream_embeddings_endpoint_text_too_long():
+    """Test that the streaming endpoint validates texts before streaming."""
+    response = client.post("/embeddings/stream", json={"texts": ["x" * 100000]})
+    assert response.status_code == 400
+
+
+def test_stream_embeddings_endpoint(monkeypatch):
+    """Test that streamed lines cover every text, in order, across batches."""
+    model = FakeModel()
+    monkeypatch.setattr(main.embedding_service, "model", model)
+    monkeypatch.setattr(main.embedding_service, "model_name", "fake-model")
+    monkeypatch.setattr(main.embedding_service, "_torch", torch)
+    monkeypatch.setattr(main.embedding_service, "_transformer", None)
+    monkeypatch.setattr(main.embedding_service, "_cache", OrderedDict())
+    body = {"texts": ["a", "bb", "ccc", "dddd", "eeeee"], "model_name": "fake-model", "batch_size": 2}
+
+    response = client.post("/embeddings/stream", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [line["i"] for line in lines] == [0, 1, 2, 3, 4]
+    assert model.calls == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    expected = client.post("/embeddings", json=body).json()["embeddings"]
+    assert [line["v"] for line in lines] == expected
+
+
+def test_embeddings_endpoint_invalid_encoding():
+    """Test embeddings endpoint with an unsupported encoding."""
+    response = client.post("/embeddings", json={"texts": ["test"], "encoding": "base64_f64"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("encoding,dtype", [("base64_f32", np.float32), ("base64_f16", np.float16)])
+def test_embeddings_to_base64_round_trip(encoding, dtype):
+    """Test that base64-encoded embeddings decode back to the original array."""
+    embeddings = np.arange(6, dtype=np.float32).reshape(2, 3) / 4
+    decoded = np.frombuffer(base64.b64decode(embeddings_to_base64(embeddings, encoding)), dtype=dtype)
+    np.testing.assert_array_equal(decoded.reshape(-1, 3), embeddings)
+
+
+def test_metrics_endpoint():
+    """Test the metrics endpoint."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert "cache" in data
+    assert "hit_rate" in data["cache"]
+
+
 def test_docs_endpoint():
     """Test that the docs endpoint is accessible."""
     response = client.get("/docs")